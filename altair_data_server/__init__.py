@@ -1,4 +1,5 @@
 """Altair data server"""
+
 __version__ = "0.5.0.dev0"
 __all__ = [
     "AltairDataServer",
@@ -6,7 +7,13 @@ __all__ = [
     "data_server_proxied",
     "Provider",
     "Resource",
+    "columnar_transforms",
+    "LoadTestReport",
+    "TrafficProfile",
+    "run_load_test",
 ]
 
 from ._altair_server import AltairDataServer, data_server, data_server_proxied
+from ._columnar import columnar_transforms
+from ._loadtest import LoadTestReport, TrafficProfile, run_load_test
 from ._provide import Provider, Resource
@@ -1,9 +1,21 @@
 """Altair data server."""
 
-from typing import Dict, Optional, Tuple
+from concurrent.futures import Executor, ProcessPoolExecutor
+import json
+import threading
+from typing import Any, Dict, Optional, Tuple
 from urllib import parse
 
+from altair_data_server._arrow import ArrowStore, _ArrowResource, data_hash
+from altair_data_server._columnar import to_columnar_json
+from altair_data_server._parallel import process_pool, serialize_parallel
 from altair_data_server._provide import Provider, Resource
+from altair_data_server._topojson import (
+    OBJECT_NAME,
+    _check_arguments,
+    _json_default,
+    _TopoJSONResource,
+)
 from altair.utils.data import (
     _data_to_json_string,
     _data_to_csv_string,
@@ -11,12 +23,38 @@ from altair.utils.data import (
 )
 import pandas as pd
 
+# File extensions for formats which are not named after their extension.
+_EXTENSIONS = {"columnar": "json"}
+
+# Frames with fewer rows are serialized in-process, even if processes is set.
+_PARALLEL_MIN_ROWS = 100_000
+
 
 class AltairDataServer:
     """Backend server for Altair datasets."""
 
-    def __init__(self) -> None:
+    def __init__(self, admin: bool = False, cache_size: Optional[int] = None) -> None:
+        """Initialize the data server.
+
+        Parameters
+        ----------
+        admin: bool
+            If True, serve the statistics of the served resources as JSON at
+            ``/_admin/resources``. Default = False.
+        cache_size: int, optional
+            Maximum size in bytes of cached resource output, such as TopoJSON
+            variants. If None (default), the size is unlimited.
+
+        Both take effect when the server is started, or restarted after
+        :meth:`reset`.
+        """
+        self.admin = admin
+        self.cache_size = cache_size
         self._provider: Optional[Provider] = None
+        self._provider_lock = threading.Lock()
+        self._store: Optional[ArrowStore] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_processes = 0
         # We need to keep references to served resources, because the background
         # server uses weakrefs.
         self._resources: Dict[str, Resource] = {}
@@ -24,31 +62,161 @@ class AltairDataServer:
     def reset(self) -> None:
         if self._provider is not None:
             self._provider.stop()
+            self._provider = None
         self._resources = {}
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def prestart(self, port: Optional[int] = None) -> None:
+        """Start the server in a background thread, ahead of the first chart.
+
+        Otherwise picking a port and starting the server thread happen when the
+        first chart is rendered. Charts rendered before startup completes wait
+        for it to finish.
+        """
+        threading.Thread(target=self._get_provider, args=(port,), daemon=True).start()
+
+    def _get_provider(self, port: Optional[int] = None) -> Provider:
+        """Return the running provider, listening on the given port if any.
+
+        Changing ports adds a listening socket to the running server rather
+        than restarting it, so URLs on previous ports remain valid.
+        """
+        with self._provider_lock:
+            if self._provider is None:
+                self._provider = Provider(cache_size=self.cache_size, admin=self.admin)
+            self._provider.start(port=port)
+            if port is not None:
+                self._provider.listen(port)
+            return self._provider
+
+    def _get_executor(self, processes: int) -> ProcessPoolExecutor:
+        """Return a pool of the given number of worker processes.
+
+        Workers are spawned rather than forked where supported, because the
+        server thread may be running, and the pool is reused until the number
+        changes.
+        """
+        if self._executor is None or self._executor_processes != processes:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = process_pool(processes)
+            self._executor_processes = processes
+        return self._executor
 
     @staticmethod
-    def _serialize(data: pd.DataFrame, fmt: str) -> Tuple[str, str]:
-        """Serialize data to the given format."""
-        if fmt == "json":
+    def _serialize(
+        data: pd.DataFrame,
+        fmt: str,
+        executor: Optional[Executor] = None,
+        partitions: int = 1,
+    ) -> Tuple[str, str]:
+        """Serialize data to the given format.
+
+        If an executor is given, JSON and CSV are serialized in partitions.
+        """
+        if fmt in ("json", "csv") and executor is not None:
+            content = serialize_parallel(data, fmt, executor, partitions)
+        elif fmt == "json":
             content = _data_to_json_string(data)
         elif fmt == "csv":
             content = _data_to_csv_string(data)
+        elif fmt == "columnar":
+            content = to_columnar_json(data)
         else:
             raise ValueError(f"Unrecognized format: {fmt!r}")
         return content, _compute_data_hash(content)
 
+    def _serve_geo(
+        self,
+        provider: Provider,
+        data: Any,
+        quantization: Optional[int],
+        simplify: Optional[float],
+    ) -> Dict[str, Any]:
+        """Serve data with a __geo_interface__ as quantized TopoJSON."""
+        if not hasattr(data, "__geo_interface__"):
+            raise ValueError("fmt='topojson' requires data with a __geo_interface__")
+        # Fail here rather than with an HTTP error when the chart is rendered.
+        _check_arguments(quantization or 10000, simplify)
+        geo = data.__geo_interface__
+        resource_id = "topojson:" + _compute_data_hash(
+            json.dumps(geo, sort_keys=True, default=_json_default)
+        )
+        if resource_id not in self._resources:
+            self._resources[resource_id] = provider.create(
+                resource=_TopoJSONResource(
+                    geo,
+                    provider=provider,
+                    extension="topojson",
+                    headers={
+                        "Access-Control-Allow-Origin": "*",
+                        "Content-Type": "application/json",
+                    },
+                )
+            )
+        url = self._resources[resource_id].url
+        query = {
+            key: value
+            for key, value in [("quantization", quantization), ("simplify", simplify)]
+            if value is not None
+        }
+        if query:
+            url += "?" + parse.urlencode(query)
+        return {"url": url, "format": {"type": "topojson", "feature": OBJECT_NAME}}
+
+    def _serve_arrow(
+        self, provider: Provider, data: pd.DataFrame, fmt: str
+    ) -> Dict[str, Any]:
+        """Serve data from a memory-mapped Arrow file, encoded on request."""
+        if fmt not in ("json", "csv"):
+            raise ValueError(f"storage='arrow' does not support fmt={fmt!r}")
+        resource_id = f"arrow-{fmt}:" + data_hash(data)
+        if resource_id not in self._resources:
+            if self._store is None:
+                self._store = ArrowStore()
+            self._resources[resource_id] = provider.create(
+                resource=_ArrowResource(
+                    self._store.write(data),
+                    fmt,
+                    provider=provider,
+                    extension=fmt,
+                    headers={"Access-Control-Allow-Origin": "*"},
+                )
+            )
+        return {"url": self._resources[resource_id].url}
+
     def __call__(
-        self, data: pd.DataFrame, fmt: str = "json", port: Optional[int] = None
-    ) -> Dict[str, str]:
-        if self._provider is None:
-            self._provider = Provider().start(port=port)
-        if port is not None and port != self._provider.port:
-            self._provider.stop().start(port=port)
-        content, resource_id = self._serialize(data, fmt)
+        self,
+        data: pd.DataFrame,
+        fmt: str = "json",
+        port: Optional[int] = None,
+        *,
+        quantization: Optional[int] = None,
+        simplify: Optional[float] = None,
+        storage: str = "memory",
+        processes: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        provider = self._get_provider(port)
+        if fmt == "topojson":
+            return self._serve_geo(provider, data, quantization, simplify)
+        if storage == "arrow":
+            return self._serve_arrow(provider, data, fmt)
+        if storage != "memory":
+            raise ValueError(f"Unrecognized storage: {storage!r}")
+        if processes and len(data) >= _PARALLEL_MIN_ROWS:
+            executor = self._get_executor(processes)
+            content, resource_id = self._serialize(data, fmt, executor, processes)
+        else:
+            content, resource_id = self._serialize(data, fmt)
         if resource_id not in self._resources:
-            self._resources[resource_id] = self._provider.create(
+            self._resources[resource_id] = provider.create(
                 content=content,
-                extension=fmt,
+                extension=_EXTENSIONS.get(fmt, fmt),
                 headers={"Access-Control-Allow-Origin": "*"},
             )
         return {"url": self._resources[resource_id].url}
@@ -61,13 +229,16 @@ class AltairDataServerProxied(AltairDataServer):
         fmt: str = "json",
         port: Optional[int] = None,
         urlpath: str = "..",
-    ) -> Dict[str, str]:
-        result = super().__call__(data, fmt=fmt, port=port)
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        result = super().__call__(data, fmt=fmt, port=port, **kwargs)
 
         url_parts = parse.urlparse(result["url"])
         urlpath = urlpath.rstrip("/")
         # vega defaults to <base>/files, redirect it to <base>/proxy/<port>/<file>
         result["url"] = f"{urlpath}/proxy/{url_parts.port}{url_parts.path}"
+        if url_parts.query:
+            result["url"] += f"?{url_parts.query}"
 
         return result
 
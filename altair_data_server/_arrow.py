@@ -0,0 +1,174 @@
+"""Arrow-backed resources, served from memory-mapped files.
+
+Rather than holding a serialized copy of each dataframe in memory, the frame
+is written once to an Arrow IPC file and encoded on request, one record batch
+at a time, from a memory map of that file. Resident memory then stays close to
+the size of the data, and the OS page cache decides what stays hot.
+
+pyarrow is an optional dependency, and is only imported when used.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Any, Awaitable, Dict, Optional
+import uuid
+import weakref
+
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from altair_data_server._parallel import encode_fragment
+from altair_data_server._provide import Provider, Resource
+
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError("storage='arrow' requires pyarrow to be installed.")
+    return pyarrow
+
+
+def data_hash(data: pd.DataFrame) -> str:
+    """Hash the contents of a dataframe without serializing it."""
+    hasher = hashlib.sha256()
+    hasher.update(repr(list(zip(data.columns, data.dtypes))).encode())
+    for i in range(data.shape[1]):
+        column = data.iloc[:, i]
+        try:
+            hasher.update(pd.util.hash_pandas_object(column, index=False).values)
+        except TypeError:
+            # Unhashable values such as lists: hash their serialized form.
+            hasher.update(pickle.dumps(column.tolist()))
+    return hasher.hexdigest()[:32]
+
+
+class ArrowStore:
+    """Directory of Arrow IPC files backing served dataframes.
+
+    The directory is removed when the store is closed or garbage collected.
+    """
+
+    def __init__(self, directory: Optional[str] = None, chunksize: int = 65536):
+        """Initialize the store.
+
+        Parameters
+        ----------
+        directory: str, optional
+            Directory in which to create the store. Defaults to the system
+            temporary directory.
+        chunksize: int
+            Maximum number of rows per record batch, which is the unit in which
+            data is read and encoded. Default = 65536.
+        """
+        self._pa = _import_pyarrow()
+        self.path = tempfile.mkdtemp(prefix="altair_data_server_", dir=directory)
+        self.chunksize = chunksize
+        self._finalizer = weakref.finalize(
+            self, shutil.rmtree, self.path, ignore_errors=True
+        )
+
+    def write(self, data: pd.DataFrame) -> str:
+        """Write a dataframe to a new file in the store, returning its path.
+
+        Raises
+        ------
+        ValueError
+            If a column cannot be converted to Arrow, e.g. because it mixes
+            values of different types.
+        """
+        try:
+            table = self._pa.Table.from_pandas(data, preserve_index=False)
+        except self._pa.ArrowException as err:
+            for i, name in enumerate(data.columns):
+                try:
+                    self._pa.array(data.iloc[:, i], from_pandas=True)
+                except self._pa.ArrowException:
+                    raise ValueError(
+                        f"storage='arrow' cannot store column {name!r}: {err}"
+                    ) from err
+            raise
+        filepath = os.path.join(self.path, f"{uuid.uuid4()}.arrow")
+        with self._pa.OSFile(filepath, "wb") as sink:
+            with self._pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=self.chunksize)
+        return filepath
+
+    def close(self) -> None:
+        """Remove the store and all of its files."""
+        self._finalizer()
+
+
+def _remove(filepath: str) -> None:
+    try:
+        os.remove(filepath)
+    except OSError:
+        pass
+
+
+class _ArrowResource(Resource):
+    """Arrow Resource
+
+    Serves a dataframe stored in an Arrow IPC file as JSON or CSV. Each record
+    batch is read from a memory map and encoded in an executor, and the output
+    is streamed to the client batch by batch. The file is removed when the
+    resource is garbage collected.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        fmt: str,
+        provider: Provider,
+        headers: Dict[str, str],
+        extension: Optional[str] = None,
+        route: Optional[str] = None,
+    ):
+        if fmt not in ("json", "csv"):
+            raise ValueError(f"Unrecognized format: {fmt!r}")
+        self._pa = _import_pyarrow()
+        self.filepath = filepath
+        self.fmt = fmt
+        weakref.finalize(self, _remove, filepath)
+        super().__init__(
+            provider=provider, headers=headers, extension=extension, route=route
+        )
+
+    @property
+    def nbytes(self) -> Optional[int]:
+        """Size of the backing file, or None if it has been removed."""
+        try:
+            return os.path.getsize(self.filepath)
+        except OSError:
+            return None
+
+    def get(self, handler: tornado.web.RequestHandler) -> Optional[Awaitable[None]]:
+        super().get(handler)
+        return self._stream(handler)
+
+    async def _stream(self, handler: tornado.web.RequestHandler) -> None:
+        loop = tornado.ioloop.IOLoop.current()
+        with self._pa.memory_map(self.filepath) as source:
+            reader = self._pa.ipc.open_file(source)
+
+            def encode(i: int) -> str:
+                if reader.num_record_batches:
+                    frame = reader.get_batch(i).to_pandas()
+                else:
+                    frame = reader.schema.empty_table().to_pandas()
+                return encode_fragment(frame, self.fmt, first=(i == 0))
+
+            separator = "[" if self.fmt == "json" else ""
+            for i in range(max(reader.num_record_batches, 1)):
+                content = await loop.run_in_executor(None, encode, i)
+                if content:
+                    handler.write(separator + content)
+                    separator = "," if self.fmt == "json" else ""
+                    await handler.flush()
+            if self.fmt == "json":
+                handler.write("]" if separator == "," else "[]")
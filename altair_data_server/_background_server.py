@@ -17,6 +17,7 @@
 # limitations under the License.
 """WSGI server utilities to run in thread. WSGI chosen for easier interop."""
 
+import socket
 import threading
 
 import portpicker
@@ -24,7 +25,8 @@ import tornado
 import tornado.web
 import tornado.ioloop
 import tornado.httpserver
-from typing import Callable, Optional, Tuple, TypeVar
+import tornado.netutil
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 
 
 def _build_server(
@@ -49,6 +51,24 @@ def _build_server(
     """
 
 
+def _remove_sockets(
+    server: tornado.httpserver.HTTPServer, sockets: List[socket.socket]
+) -> None:
+    """Stop a server accepting connections on some of its sockets.
+
+    Tornado has no public API for this, so this mirrors ``TCPServer.stop``,
+    which unregisters each socket's accept handler and closes it. Must be
+    called from the server's IOLoop thread.
+    """
+    for sock in sockets:
+        fd = sock.fileno()
+        server._sockets.pop(fd, None)
+        remove_handler = server._handlers.pop(fd, None)
+        if remove_handler is not None:
+            remove_handler()
+        sock.close()
+
+
 T = TypeVar("T", bound="_BackgroundServer")
 
 
@@ -57,9 +77,11 @@ class _BackgroundServer:
 
     _app: tornado.web.Application
     _port: Optional[int]
+    _sockets: Dict[int, List[socket.socket]]
     _server_thread: Optional[threading.Thread]
     _ioloop: Optional[tornado.ioloop.IOLoop]
     _server: Optional[tornado.httpserver.HTTPServer]
+    _lock: threading.Lock
 
     def __init__(self: T, app: tornado.web.Application) -> None:
         """Initialize the BackgroundServer.
@@ -71,9 +93,13 @@ class _BackgroundServer:
         """
         self._app = app
         self._port = None
+        self._sockets = {}
         self._server_thread = None
         self._ioloop = None
         self._server = None
+        # Serializes start, stop and changes of port, which may be called from
+        # any thread.
+        self._lock = threading.Lock()
 
     @property
     def app(self: T) -> tornado.web.Application:
@@ -97,6 +123,98 @@ class _BackgroundServer:
             raise RuntimeError("Server not running.")
         return self._port
 
+    @property
+    def ports(self: T) -> List[int]:
+        """Returns all ports the server is listening on.
+
+        Returns
+        -------
+        ports: list of int
+            The ports being used by the server, including ``port``.
+
+        Raises
+        ------
+        RuntimeError: If server has not been started yet.
+        """
+        if self._server_thread is None:
+            raise RuntimeError("Server not running.")
+        return list(self._sockets)
+
+    def listen(self: T, port: int) -> T:
+        """Makes a running server listen on an additional port.
+
+        The new port becomes the server's primary ``port``. Sockets on previous
+        ports are kept open, so existing URLs continue to work and switching
+        back to a previous port is free. This does not restart the server
+        thread, so in-flight requests are unaffected.
+
+        Parameters
+        ----------
+        port: int
+            Number of the port to listen on.
+
+        Returns
+        -------
+        self :
+            Returns self for chaining.
+
+        Raises
+        ------
+        RuntimeError: If server has not been started yet.
+        """
+        with self._lock:
+            if self._server_thread is None:
+                raise RuntimeError("Server not running.")
+            assert self._ioloop is not None
+            assert self._server is not None
+
+            if port not in self._sockets:
+                # Bind in the calling thread so that errors are raised here, but
+                # register the sockets from the IOLoop thread which owns them.
+                sockets = tornado.netutil.bind_sockets(port)
+                self._sockets[port] = sockets
+                self._ioloop.add_callback(self._server.add_sockets, sockets)
+            self._port = port
+        return self
+
+    def unlisten(self: T, port: int) -> T:
+        """Makes a running server stop listening on a secondary port.
+
+        The sockets on the port are closed, so new connections to it are
+        refused. Requests already in progress on the port are unaffected.
+
+        Parameters
+        ----------
+        port: int
+            Number of the port to stop listening on.
+
+        Returns
+        -------
+        self :
+            Returns self for chaining.
+
+        Raises
+        ------
+        RuntimeError: If server has not been started yet.
+        ValueError: If ``port`` is the primary port, or is not being listened on.
+        """
+        with self._lock:
+            if self._server_thread is None:
+                raise RuntimeError("Server not running.")
+            assert self._ioloop is not None
+            assert self._server is not None
+
+            if port == self._port:
+                raise ValueError(
+                    f"Cannot stop listening on the primary port {port}; "
+                    "listen on another port first."
+                )
+            if port not in self._sockets:
+                raise ValueError(f"Server is not listening on port {port}.")
+            sockets = self._sockets.pop(port)
+            self._ioloop.add_callback(_remove_sockets, self._server, sockets)
+        return self
+
     def stop(self: T) -> T:
         """Stops the server thread.
 
@@ -107,25 +225,27 @@ class _BackgroundServer:
         self :
             Returns self for chaining.
         """
-        if self._server_thread is None:
-            return self
-        assert self._ioloop is not None
-        assert self._server is not None
-
-        def shutdown() -> None:
-            if self._server is not None:
-                self._server.stop()
-            if self._ioloop is not None:
-                self._ioloop.stop()
-
-        try:
-            self._ioloop.add_callback(shutdown)
-            self._server_thread.join()
-            self._ioloop.close(all_fds=True)
-        finally:
-            self._server_thread = None
-            self._ioloop = None
-            self._server = None
+        with self._lock:
+            if self._server_thread is None:
+                return self
+            assert self._ioloop is not None
+            assert self._server is not None
+
+            def shutdown() -> None:
+                if self._server is not None:
+                    self._server.stop()
+                if self._ioloop is not None:
+                    self._ioloop.stop()
+
+            try:
+                self._ioloop.add_callback(shutdown)
+                self._server_thread.join()
+                self._ioloop.close(all_fds=True)
+            finally:
+                self._sockets = {}
+                self._server_thread = None
+                self._ioloop = None
+                self._server = None
 
         return self
 
@@ -152,37 +272,44 @@ class _BackgroundServer:
         self :
             Returns self for chaining.
         """
-        if self._server_thread is not None:
-            return self
-
-        self._port = port
-
-        if self._port is None:
-            self._port = portpicker.pick_unused_port()
-
-        self._ioloop = tornado.ioloop.IOLoop()
-        self._server = tornado.httpserver.HTTPServer(
-            self._app, idle_connection_timeout=timeout, body_timeout=timeout
-        )
-
-        def start_server(
-            ioloop: tornado.ioloop.IOLoop,
-            httpd: tornado.httpserver.HTTPServer,
-            port: int,
-        ) -> None:
-            ioloop.make_current()
-            httpd.listen(port=port)
-            ioloop.start()
-
-        self._server_thread = threading.Thread(
-            target=start_server,
-            daemon=daemon,
-            kwargs={"ioloop": self._ioloop, "httpd": self._server, "port": self._port},
-        )
-
-        started = threading.Event()
-        self._ioloop.add_callback(started.set)
-        self._server_thread.start()
-        started.wait()
+        with self._lock:
+            if self._server_thread is not None:
+                return self
+
+            self._port = port
+
+            if self._port is None:
+                self._port = portpicker.pick_unused_port()
+
+            sockets = tornado.netutil.bind_sockets(self._port)
+            self._sockets = {self._port: sockets}
+            self._ioloop = tornado.ioloop.IOLoop()
+            self._server = tornado.httpserver.HTTPServer(
+                self._app, idle_connection_timeout=timeout, body_timeout=timeout
+            )
+
+            def start_server(
+                ioloop: tornado.ioloop.IOLoop,
+                httpd: tornado.httpserver.HTTPServer,
+                sockets: List[socket.socket],
+            ) -> None:
+                ioloop.make_current()
+                httpd.add_sockets(sockets)
+                ioloop.start()
+
+            self._server_thread = threading.Thread(
+                target=start_server,
+                daemon=daemon,
+                kwargs={
+                    "ioloop": self._ioloop,
+                    "httpd": self._server,
+                    "sockets": sockets,
+                },
+            )
+
+            started = threading.Event()
+            self._ioloop.add_callback(started.set)
+            self._server_thread.start()
+            started.wait()
 
         return self
@@ -0,0 +1,67 @@
+"""Memory budget shared by cached resource content."""
+
+import collections
+import threading
+from typing import Callable, Hashable, Optional, Tuple
+
+
+class MemoryBudget:
+    """Least-recently-used byte budget for cached content.
+
+    Each cache entry is registered with its size and a callback which drops
+    the cached content. When the total size exceeds the budget, the least
+    recently used entries are evicted until it fits again.
+    """
+
+    _entries: "collections.OrderedDict[Hashable, Tuple[int, Callable[[], None]]]"
+
+    def __init__(self, max_bytes: Optional[int] = None) -> None:
+        """Initialize the budget.
+
+        Parameters
+        ----------
+        max_bytes: int, optional
+            Maximum total size of cached content. If None (default), the
+            size is unlimited.
+        """
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of the cached content."""
+        return self._nbytes
+
+    def add(self, key: Hashable, size: int, evict: Callable[[], None]) -> None:
+        """Add or replace a cache entry, evicting others if over budget.
+
+        ``evict`` is called when the entry is evicted, and must not call back
+        into the budget. An entry larger than the whole budget is evicted at
+        once, leaving the other entries in place.
+        """
+        with self._lock:
+            self.discard(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                evict()
+                return
+            self._entries[key] = (size, evict)
+            self._nbytes += size
+            while self.max_bytes is not None and self._nbytes > self.max_bytes:
+                _, (size, evict) = self._entries.popitem(last=False)
+                self._nbytes -= size
+                evict()
+
+    def touch(self, key: Hashable) -> None:
+        """Mark an entry as recently used."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def discard(self, key: Hashable) -> None:
+        """Remove an entry without calling its eviction callback."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._nbytes -= entry[0]
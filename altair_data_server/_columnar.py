@@ -0,0 +1,136 @@
+"""Columnar, dictionary-encoded JSON payloads.
+
+Records-oriented JSON repeats every column name and every string value on
+every row. The columnar payload instead stores one array per column, and
+low-cardinality string columns are stored as integer codes alongside a single
+array of their distinct values::
+
+    {"x": [0, 1, 2], "y": [0, 1, 0], "__categories__y": ["A", "B"]}
+
+Vega cannot read this layout directly, so :func:`columnar_transforms` returns
+the Vega-Lite transforms (a ``flatten`` followed by one ``calculate`` per
+encoded column) which expand it back into one object per row on the client.
+"""
+
+import json
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+try:
+    from altair.utils import sanitize_dataframe  # type: ignore[attr-defined]
+except ImportError:  # altair >= 5
+    from altair.utils.core import sanitize_pandas_dataframe as sanitize_dataframe
+
+_CATEGORIES_PREFIX = "__categories__"
+
+
+def _dictionary_encode(
+    data: pd.DataFrame,
+) -> Dict[str, Tuple[pd.Series, pd.Index]]:
+    """Return the codes and categories of the columns to dictionary-encode.
+
+    Categorical columns are always encoded, using their existing codes. String
+    columns are factorized, and are only encoded if they have at most half as
+    many distinct values as rows. Missing values are given the code -1.
+    """
+    encoded = {}
+    for name in data.columns:
+        column = data[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, categories = column.cat.codes, column.cat.categories
+        elif pd.api.types.infer_dtype(column, skipna=True) == "string":
+            codes, categories = pd.factorize(column)
+            if 2 * len(categories) > len(column):
+                continue
+        else:
+            continue
+        encoded[name] = (pd.Series(codes, dtype="int64"), pd.Index(categories))
+    return encoded
+
+
+def _escape_field(name: str) -> str:
+    """Escape a column name for use as a Vega-Lite field string."""
+    for char in "\\.[]":
+        name = name.replace(char, "\\" + char)
+    return name
+
+
+def _to_json_array(values: pd.Series) -> str:
+    return values.to_json(orient="records", double_precision=15)
+
+
+def to_columnar_json(data: pd.DataFrame) -> str:
+    """Serialize a dataframe to a columnar, dictionary-encoded JSON string.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The data to serialize.
+
+    Returns
+    -------
+    content : str
+        JSON object with one array per column. Use :func:`columnar_transforms`
+        to expand it into records within a chart.
+    """
+    encoded = _dictionary_encode(data)
+    plain = sanitize_dataframe(data.drop(columns=list(encoded)))
+    items = []
+    for name in data.columns:
+        if name in encoded:
+            codes, categories = encoded[name]
+            values = _to_json_array(codes)
+            categories = sanitize_dataframe(pd.DataFrame({name: categories}))[name]
+            items.append((_CATEGORIES_PREFIX + name, _to_json_array(categories)))
+        else:
+            values = _to_json_array(plain[name])
+        items.append((name, values))
+    return "{" + ",".join(f"{json.dumps(key)}:{value}" for key, value in items) + "}"
+
+
+def columnar_transforms(data: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Vega-Lite transforms which expand a columnar payload into records.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The data served with ``fmt="columnar"``.
+
+    Returns
+    -------
+    transforms : list of dict
+        Transforms to place at the start of the chart's ``transform`` list.
+
+    Examples
+    --------
+    >>> df = pd.DataFrame({"x": [1, 2, 3, 4], "y": list("ABAA")})
+    >>> transforms = columnar_transforms(df)
+    >>> transforms[0]
+    {'flatten': ['x', 'y'], 'as': ['x', 'y']}
+    >>> transforms[1]["as"]
+    'y'
+    """
+    for name in data.columns:
+        if not isinstance(name, str):
+            raise ValueError(
+                f"Dataframe contains invalid column name: {name!r}. "
+                "Column names must be strings"
+            )
+    encoded = _dictionary_encode(data)
+    transforms: List[Dict[str, Any]] = [
+        {
+            "flatten": [_escape_field(name) for name in data.columns],
+            "as": list(data.columns),
+        }
+    ]
+    for name in encoded:
+        codes = f"datum[{json.dumps(name)}]"
+        categories = f"datum[{json.dumps(_CATEGORIES_PREFIX + name)}]"
+        transforms.append(
+            {
+                "calculate": f"{codes} < 0 ? null : {categories}[{codes}]",
+                "as": name,
+            }
+        )
+    return transforms
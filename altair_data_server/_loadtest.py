@@ -0,0 +1,256 @@
+"""Load testing of a Provider under dashboard-like traffic.
+
+A `TrafficProfile` describes a reproducible mix of resources and requests:
+resources of mixed sizes, some of them TTL-cached handlers, and a share of
+requests concentrated on a few hot resources. `run_load_test` serves the
+resources, replays the requests from concurrent asyncio clients, and returns a
+`LoadTestReport` of latency and throughput.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+from altair_data_server._provide import Provider, Resource
+
+
+class TrafficProfile:
+    """Reproducible mix of resources and requests for a load test."""
+
+    def __init__(
+        self,
+        clients: int = 10,
+        requests_per_client: int = 100,
+        resources: int = 20,
+        sizes: Sequence[int] = (1_000, 100_000, 1_000_000),
+        hot_resources: float = 0.2,
+        hot_requests: float = 0.8,
+        cached_fraction: float = 0.0,
+        ttl: float = 1.0,
+        handler_delay: float = 0.0,
+        seed: int = 0,
+    ):
+        """Initialize the profile.
+
+        Parameters
+        ----------
+        clients: int
+            Number of concurrent clients. Default = 10.
+        requests_per_client: int
+            Number of requests made in sequence by each client. Default = 100.
+        resources: int
+            Number of resources to serve. Default = 20.
+        sizes: sequence of int
+            Sizes in bytes of the resources, chosen uniformly at random.
+        hot_resources: float
+            Fraction of the resources which are hot. Default = 0.2.
+        hot_requests: float
+            Fraction of the requests which go to hot resources. Default = 0.8.
+        cached_fraction: float
+            Fraction of the resources served by handlers cached for ``ttl``
+            seconds, rather than as static content. Default = 0.
+        ttl: float
+            Time to live of cached handler output in seconds. Default = 1.
+        handler_delay: float
+            Time in seconds taken by each call to a handler, to simulate
+            expensive handlers. Default = 0.
+        seed: int
+            Seed of the random choices of sizes and requests. Default = 0.
+        """
+        self.clients = clients
+        self.requests_per_client = requests_per_client
+        self.resources = resources
+        self.sizes = sizes
+        self.hot_resources = hot_resources
+        self.hot_requests = hot_requests
+        self.cached_fraction = cached_fraction
+        self.ttl = ttl
+        self.handler_delay = handler_delay
+        self.seed = seed
+
+    def resource_sizes(self) -> List[int]:
+        """Size of each resource."""
+        rng = random.Random(self.seed)
+        return [rng.choice(self.sizes) for _ in range(self.resources)]
+
+    def schedule(self) -> List[List[int]]:
+        """Indices of the resources requested by each client, in order."""
+        rng = random.Random(self.seed + 1)
+        hot = max(1, round(self.hot_resources * self.resources))
+        cold = self.resources - hot
+
+        def choose() -> int:
+            if not cold or rng.random() < self.hot_requests:
+                return rng.randrange(hot)
+            return hot + rng.randrange(cold)
+
+        return [
+            [choose() for _ in range(self.requests_per_client)]
+            for _ in range(self.clients)
+        ]
+
+
+class LoadTestReport:
+    """Latency and throughput of a load test."""
+
+    def __init__(
+        self,
+        latencies: Sequence[float],
+        nbytes: int,
+        errors: int,
+        duration: float,
+        stats: List[Dict[str, Any]],
+    ):
+        self.latencies = np.asarray(latencies)
+        self.nbytes = nbytes
+        self.errors = errors
+        self.duration = duration
+        self.stats = stats
+
+    @property
+    def requests(self) -> int:
+        """Number of completed requests, including errors."""
+        return len(self.latencies)
+
+    @property
+    def throughput(self) -> float:
+        """Requests per second."""
+        return self.requests / self.duration if self.duration else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Latency in seconds at the given percentile."""
+        return float(np.percentile(self.latencies, q)) if self.requests else 0.0
+
+    @property
+    def cache_hit_ratio(self) -> Optional[float]:
+        """Fraction of requests to cached handlers served without computing."""
+        cached = [s for s in self.stats if "computed" in s]
+        hits = sum(s["hits"] for s in cached)
+        if not hits:
+            return None
+        return 1 - sum(s["computed"] for s in cached) / hits
+
+    def __str__(self) -> str:
+        lines = [
+            f"requests:   {self.requests} ({self.errors} errors)",
+            f"duration:   {self.duration:.3f} s",
+            f"throughput: {self.throughput:.1f} req/s, "
+            f"{self.nbytes / self.duration / 1e6 if self.duration else 0:.1f} MB/s",
+            "latency:    "
+            + ", ".join(
+                f"p{q} {1000 * self.percentile(q):.1f} ms" for q in (50, 90, 99)
+            ),
+        ]
+        if self.cache_hit_ratio is not None:
+            lines.append(f"cache hits: {100 * self.cache_hit_ratio:.1f}%")
+        return "\n".join(lines)
+
+
+def _payload_handler(payload: str, delay: float) -> Callable[[], str]:
+    def handler() -> str:
+        time.sleep(delay)
+        return payload
+
+    return handler
+
+
+def _create_resources(provider: Provider, profile: TrafficProfile) -> List[Resource]:
+    rng = random.Random(profile.seed + 2)
+    resources = []
+    for i, size in enumerate(profile.resource_sizes()):
+        # Prefix with the index so every payload, and hence route, is distinct.
+        payload = f"{i:08d}".ljust(size, "x")
+        if rng.random() < profile.cached_fraction:
+            resource = provider.create(
+                handler=_payload_handler(payload, profile.handler_delay),
+                ttl=profile.ttl,
+                extension="txt",
+            )
+        else:
+            resource = provider.create(content=payload, extension="txt")
+        resources.append(resource)
+    return resources
+
+
+async def _replay(urls: List[str], profile: TrafficProfile) -> LoadTestReport:
+    client = AsyncHTTPClient(force_instance=True, max_clients=profile.clients)
+    latencies: List[float] = []
+    counts = {"nbytes": 0, "errors": 0}
+
+    async def run_client(schedule: List[int]) -> None:
+        for index in schedule:
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(urls[index])
+                counts["nbytes"] += len(response.body)
+            except (HTTPClientError, OSError):
+                counts["errors"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_client(s) for s in profile.schedule()))
+    finally:
+        client.close()
+    duration = time.perf_counter() - start
+    return LoadTestReport(latencies, counts["nbytes"], counts["errors"], duration, [])
+
+
+def run_load_test(
+    profile: Optional[TrafficProfile] = None, provider: Optional[Provider] = None
+) -> LoadTestReport:
+    """Serve the resources of a traffic profile and replay its requests.
+
+    The clients run in an event loop in a separate thread, so this can be called
+    from a notebook whose event loop is already running.
+
+    Parameters
+    ----------
+    profile: TrafficProfile, optional
+        The traffic to generate. Defaults to ``TrafficProfile()``.
+    provider: Provider, optional
+        The provider to test, which is left running. By default a new provider
+        is started, and stopped after the test.
+
+    Returns
+    -------
+    report: LoadTestReport
+        Latency and throughput of the requests, and the statistics of the
+        test resources after the test.
+    """
+    profile = profile or TrafficProfile()
+    owned = provider is None
+    if provider is None:
+        provider = Provider()
+    try:
+        resources = _create_resources(provider, profile)
+        urls = [resource.url for resource in resources]
+        result: Dict[str, Any] = {}
+
+        def replay() -> None:
+            # Not asyncio.run, which requires Python 3.7.
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                result["report"] = loop.run_until_complete(_replay(urls, profile))
+            except BaseException as err:
+                result["error"] = err
+            finally:
+                loop.close()
+
+        thread = threading.Thread(target=replay)
+        thread.start()
+        thread.join()
+        if "error" in result:
+            raise result["error"]
+        report: LoadTestReport = result["report"]
+        report.stats = [resource.stats() for resource in resources]
+        return report
+    finally:
+        if owned:
+            provider.stop()
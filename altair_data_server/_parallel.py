@@ -0,0 +1,83 @@
+"""Serialization of large dataframes across a pool of processes.
+
+Encoding a dataframe as JSON or CSV holds the GIL for most of its runtime, so
+encoding in a thread still blocks the kernel. Instead, the frame is split into
+row partitions which are encoded in worker processes, and the fragments are
+joined into a single payload identical to encoding the whole frame at once.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+import math
+import multiprocessing
+import sys
+from typing import List
+
+from altair.utils.data import _data_to_json_string, _data_to_csv_string
+import pandas as pd
+
+
+def encode_fragment(data: pd.DataFrame, fmt: str, first: bool) -> str:
+    """Encode a row partition of a dataframe.
+
+    Returns the CSV rows, with the header only for the first partition, or the
+    JSON records without their enclosing brackets. Use :func:`join_fragments`
+    to combine the fragments of all partitions.
+    """
+    if fmt == "json":
+        return _data_to_json_string(data)[1:-1]
+    if fmt == "csv":
+        content = _data_to_csv_string(data)
+        if not first:
+            header = _data_to_csv_string(data.iloc[:0])
+            content = content[len(header) :]
+        return content
+    raise ValueError(f"Unrecognized format: {fmt!r}")
+
+
+def join_fragments(fragments: List[str], fmt: str) -> str:
+    """Join the encoded fragments of consecutive partitions."""
+    if fmt == "json":
+        return "[" + ",".join(f for f in fragments if f) + "]"
+    return "".join(fragments)
+
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Create a pool of worker processes, spawned rather than forked.
+
+    Forked workers would inherit the state of a running server thread. Python
+    3.6 cannot set the start method of a pool, so it uses the platform default.
+    """
+    if sys.version_info < (3, 7):
+        return ProcessPoolExecutor(max_workers=max_workers)
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def serialize_parallel(
+    data: pd.DataFrame, fmt: str, executor: Executor, partitions: int
+) -> str:
+    """Serialize a dataframe by encoding row partitions in an executor.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        The data to serialize.
+    fmt : str
+        Either "json" or "csv".
+    executor : Executor
+        Executor in which to encode partitions, usually a process pool.
+    partitions : int
+        Number of row partitions, usually the number of workers.
+
+    Returns
+    -------
+    content : str
+        The serialized data, as if encoded with a single call.
+    """
+    size = max(math.ceil(len(data) / partitions), 1)
+    chunks = [data.iloc[i : i + size] for i in range(0, len(data), size)] or [data]
+    futures = [
+        executor.submit(encode_fragment, chunk, fmt, i == 0)
+        for i, chunk in enumerate(chunks)
+    ]
+    return join_fragments([future.result() for future in futures], fmt)
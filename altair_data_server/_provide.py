@@ -18,17 +18,37 @@
 """Helper to provide resources via the colab service worker."""
 
 import abc
+import asyncio
 import collections
 import hashlib
 import mimetypes
-from typing import Callable, Dict, MutableMapping, Optional
+import os
+import threading
+import time
+import types
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+)
 import uuid
 import weakref
 
+import tornado.escape
+import tornado.ioloop
+import tornado.log
 import tornado.web
 import tornado.wsgi
 
 from altair_data_server._background_server import _BackgroundServer
+from altair_data_server._cache import MemoryBudget
 
 
 class Resource(metaclass=abc.ABCMeta):
@@ -52,16 +72,22 @@ class Resource(metaclass=abc.ABCMeta):
                 route += "." + extension
         self._guid = route.lstrip("/")
         self._provider = provider
+        self.created = time.time()
+        self.hits = 0
+        self.last_access: Optional[float] = None
 
     @abc.abstractmethod
-    def get(self, handler: tornado.web.RequestHandler) -> None:
+    def get(self, handler: tornado.web.RequestHandler) -> Optional[Awaitable[None]]:
         """Gets the resource using the tornado handler passed in.
 
         Args:
         handler: Tornado handler to be used.
+        Returns:
+            None, or an awaitable if the content is written asynchronously.
         """
         for key, value in self.headers.items():
             handler.set_header(key, value)
+        return None
 
     @property
     def guid(self) -> str:
@@ -73,6 +99,28 @@ class Resource(metaclass=abc.ABCMeta):
         """Url to fetch the resource at."""
         return f"{self._provider.url}/{self._guid}"
 
+    @property
+    def nbytes(self) -> Optional[int]:
+        """Size of the content held by the resource, if known."""
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Usage statistics of the resource.
+
+        Returns:
+            A dict with the route, type, format (extension), size in bytes, age
+            in seconds, number of hits and time of last access of the resource.
+        """
+        return {
+            "route": self.guid,
+            "type": type(self).__name__.lstrip("_"),
+            "format": os.path.splitext(self.guid)[1].lstrip("."),
+            "size": self.nbytes,
+            "age": time.time() - self.created,
+            "hits": self.hits,
+            "last_access": self.last_access,
+        }
+
 
 class _ContentResource(Resource):
     """Content Resource"""
@@ -86,6 +134,8 @@ class _ContentResource(Resource):
         route: Optional[str] = None,
     ):
         self.content = content
+        # The content is immutable, so measure it once rather than per stats().
+        self._nbytes = len(tornado.escape.utf8(content))
         if route is None:
             route = hashlib.md5(self.content.encode()).hexdigest()
             if extension is not None:
@@ -95,6 +145,10 @@ class _ContentResource(Resource):
             provider=provider, headers=headers, extension=extension, route=route
         )
 
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
     def get(self, handler: tornado.web.RequestHandler) -> None:
         super().get(handler)
         handler.write(self.content)
@@ -116,6 +170,13 @@ class _FileResource(Resource):
             provider=provider, headers=headers, extension=extension, route=route
         )
 
+    @property
+    def nbytes(self) -> Optional[int]:
+        try:
+            return os.path.getsize(self.filepath)
+        except OSError:
+            return None
+
     def get(self, handler: tornado.web.RequestHandler) -> None:
         super().get(handler)
         with open(self.filepath) as f:
@@ -124,7 +185,13 @@ class _FileResource(Resource):
 
 
 class _HandlerResource(Resource):
-    """Handler Resource"""
+    """Handler Resource
+
+    If ``ttl`` is given, the handler output is cached for ``ttl`` seconds and
+    then served stale for up to ``stale_while_revalidate`` more seconds while
+    it is recomputed in the background. The handler runs in an executor, and
+    concurrent requests for missing content share a single computation.
+    """
 
     def __init__(
         self,
@@ -133,53 +200,237 @@ class _HandlerResource(Resource):
         headers: Dict[str, str],
         extension: Optional[str] = None,
         route: Optional[str] = None,
+        ttl: Optional[float] = None,
+        stale_while_revalidate: float = 0,
     ):
         self.func = func
+        self.ttl = ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self._content: Optional[str] = None
+        self._nbytes = 0
+        self._expires = 0.0
+        self._pending: Optional["asyncio.Future[str]"] = None
+        self.computed = 0
+        self._cache_key = object()
+        weakref.finalize(self, provider._cache.discard, self._cache_key)
         super().__init__(
             provider=provider, headers=headers, extension=extension, route=route
         )
 
-    def get(self, handler: tornado.web.RequestHandler) -> None:
+    @property
+    def nbytes(self) -> Optional[int]:
+        return None if self._content is None else self._nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["computed"] = self.computed
+        return stats
+
+    def get(self, handler: tornado.web.RequestHandler) -> Optional[Awaitable[None]]:
         super().get(handler)
-        content = self.func()
+        if self.ttl is None:
+            content = self.func()
+            handler.write(content)
+            return None
+        return self._get_cached(handler)
+
+    async def _get_cached(self, handler: tornado.web.RequestHandler) -> None:
+        now = time.monotonic()
+        content = self._content
+        if content is None or now >= self._expires + self.stale_while_revalidate:
+            content = await self._refresh()
+        else:
+            if now >= self._expires:
+                self._refresh().add_done_callback(self._log_refresh_error)
+            self._provider._cache.touch(self._cache_key)
         handler.write(content)
 
+    def _refresh(self) -> "asyncio.Future[str]":
+        """Recompute the content, sharing any computation already in flight."""
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._compute())
+        return self._pending
+
+    def _log_refresh_error(self, future: "asyncio.Future[str]") -> None:
+        """Log the error of a background refresh, which nothing awaits."""
+        if not future.cancelled() and future.exception() is not None:
+            tornado.log.app_log.error(
+                "Error refreshing resource %s",
+                self.guid,
+                exc_info=future.exception(),
+            )
+
+    async def _compute(self) -> str:
+        self.computed += 1
+        try:
+            loop = tornado.ioloop.IOLoop.current()
+            content = await loop.run_in_executor(None, self.func)
+        finally:
+            self._pending = None
+        assert self.ttl is not None
+        self._content = content
+        self._nbytes = len(tornado.escape.utf8(content))
+        self._expires = time.monotonic() + self.ttl
+        self._provider._cache.add(
+            self._cache_key, self._nbytes, _evictor(weakref.ref(self))
+        )
+        return content
+
+
+def _evictor(ref: "weakref.ref[_HandlerResource]") -> Callable[[], None]:
+    """Eviction callback which does not keep the resource alive."""
+
+    def evict() -> None:
+        resource = ref()
+        if resource is not None:
+            resource._content = None
+
+    return evict
+
+
+class _ResourceRegistry(MutableMapping[str, Resource]):
+    """Thread-safe mapping of routes to weakly-referenced resources.
+
+    Resources are registered from the kernel thread and looked up from the
+    IOLoop thread. Lookups read an immutable snapshot without locking, while
+    writes copy the snapshot under a lock and publish the new one in a single
+    assignment. Weakref callbacks only queue the route of a collected resource,
+    and queued routes are evicted on the next write, so garbage collection
+    never mutates the mapping at an arbitrary point.
+    """
+
+    _snapshot: Mapping[str, "weakref.KeyedRef"]
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot = types.MappingProxyType({})
+        self._collected: Deque["weakref.KeyedRef"] = collections.deque()
+
+    def _on_collect(self, ref: "weakref.KeyedRef") -> None:
+        # deque.append is atomic, so this is safe from any thread, even while
+        # a write holds the lock.
+        self._collected.append(ref)
+
+    def _publish(self, route: str, ref: Optional["weakref.KeyedRef"]) -> None:
+        """Publish a new snapshot with route set to ref, or removed if None."""
+        with self._lock:
+            routes = dict(self._snapshot)
+            while self._collected:
+                collected = self._collected.popleft()
+                # The route may have been re-registered with a new resource.
+                if routes.get(collected.key) is collected:
+                    del routes[collected.key]
+            if ref is None:
+                routes.pop(route, None)
+            else:
+                routes[route] = ref
+            self._snapshot = types.MappingProxyType(routes)
+
+    def __getitem__(self, route: str) -> Resource:
+        resource = self._snapshot[route]()
+        if resource is None:
+            raise KeyError(route)
+        return resource
+
+    def __setitem__(self, route: str, resource: Resource) -> None:
+        ref = weakref.KeyedRef(resource, self._on_collect, route)
+        self._publish(route, ref)
+
+    def __delitem__(self, route: str) -> None:
+        if route not in self._snapshot:
+            raise KeyError(route)
+        self._publish(route, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return (route for route, ref in self._snapshot.items() if ref() is not None)
+
+    def __len__(self) -> int:
+        return sum(ref() is not None for ref in self._snapshot.values())
+
 
 class ResourceHandler(tornado.web.RequestHandler):
     """Serves the `Resource` objects."""
 
-    def initialize(self, resources: Dict[str, Resource]) -> None:
+    def initialize(self, resources: Mapping[str, Resource]) -> None:
         self.resources = resources
 
-    def get(self) -> None:
+    async def get(self) -> None:
         path = self.request.path
         resource = self.resources.get(path.lstrip("/"))
         if not resource:
             raise tornado.web.HTTPError(404)
+        resource.hits += 1
+        resource.last_access = time.time()
         content_type, _ = mimetypes.guess_type(path)
         if content_type:
             self.set_header("Content-Type", content_type)
-        resource.get(self)
+        result = resource.get(self)
+        if result is not None:
+            await result
+
+
+class AdminHandler(tornado.web.RequestHandler):
+    """Lists the resources of a provider, with their usage statistics."""
+
+    def initialize(self, provider: "Provider") -> None:
+        self.provider = provider
+
+    def get(self) -> None:
+        cache = self.provider._cache
+        self.write(
+            {
+                "resources": self.provider.stats(),
+                "cache": {"nbytes": cache.nbytes, "max_bytes": cache.max_bytes},
+            }
+        )
 
 
 class Provider(_BackgroundServer):
     """Background server which can provide a set of resources."""
 
     _resources: MutableMapping[str, Resource]
+    _cache: MemoryBudget
 
-    def __init__(self) -> None:
-        """Initialize the server with a ResourceHandler script."""
-        self._resources = weakref.WeakValueDictionary()
+    def __init__(self, cache_size: Optional[int] = None, admin: bool = False) -> None:
+        """Initialize the server with a ResourceHandler script.
+
+        Args:
+            cache_size: Optional maximum size in bytes of the cached output of
+                resources, shared by all resources of this provider.
+            admin: If True, serve the statistics of all resources as JSON at
+                ``/_admin/resources``. Default False, since this exposes the
+                routes of all resources.
+        """
+        self._resources = _ResourceRegistry()
+        self._cache = MemoryBudget(cache_size)
+        self._admin = admin
         app = tornado.web.Application(self._handlers())
         super().__init__(app)
 
     def _handlers(self) -> list:
-        return [(r".*", ResourceHandler, dict(resources=self._resources))]
+        handlers: list = [(r".*", ResourceHandler, dict(resources=self._resources))]
+        if self._admin:
+            handlers.insert(
+                0, (r"/_admin/resources", AdminHandler, dict(provider=self))
+            )
+        return handlers
 
     @property
     def url(self) -> str:
         return f"http://localhost:{self.port}"
 
+    def stats(self) -> List[Dict[str, Any]]:
+        """Usage statistics of all resources currently provided.
+
+        See `Resource.stats` for the contents of each entry.
+        """
+        stats = []
+        for route in list(self._resources):
+            resource = self._resources.get(route)
+            if resource is not None:
+                stats.append(resource.stats())
+        return stats
+
     def create(
         self,
         content: str = "",
@@ -188,34 +439,56 @@ class Provider(_BackgroundServer):
         headers: Optional[Dict[str, str]] = None,
         extension: Optional[str] = None,
         route: Optional[str] = None,
+        ttl: Optional[float] = None,
+        stale_while_revalidate: float = 0,
+        max_age: Optional[int] = None,
+        resource: Optional[Resource] = None,
     ) -> Resource:
         """Creates and provides a new resource to be served.
 
-        Can only provide one of content, path, or handler.
+        Can only provide one of content, path, handler, or resource.
 
         Args:
             content: The string or byte content to return.
             filepath: The filepath to a file whose contents should be returned.
             handler: A function which will be executed and returned on each request.
-            resource: A custom resource instance.
             headers: A dict of header values to return.
             extension: Optional extension to add to the url.
             route: Optional route to serve on.
+            ttl: Optional number of seconds to cache the output of handler for.
+                Concurrent requests for uncached output share one call to
+                handler, and cached output counts toward the provider's
+                cache_size.
+            stale_while_revalidate: Number of seconds to serve expired output of
+                handler for while it is recomputed in the background.
+            max_age: Optional number of seconds for which clients may cache the
+                resource, set in the Cache-Control header.
+            resource: A custom resource instance, created with this provider.
+                Headers, extension, route and caching options are not applied.
         Returns:
             The the `Resource` object which will be served and will provide its url.
         Raises:
-            ValueError: If you don't provide one of content, filepath, or handler.
+            ValueError: If you don't provide one of content, filepath, handler, or
+                resource, or provide ttl without handler.
         """
-        sources = sum(map(bool, (content, filepath, handler)))
+        sources = sum(map(bool, (content, filepath, handler, resource)))
         if sources != 1:
             raise ValueError(
-                "Must provide exactly one of content, filepath, or handler"
+                "Must provide exactly one of content, filepath, handler, or resource"
             )
-
-        headers = headers or {}
-        resource: Resource
-
-        if content:
+        if ttl is not None and not handler:
+            raise ValueError("ttl can only be provided with handler.")
+
+        headers = dict(headers or {})
+        if max_age is not None:
+            cache_control = f"max-age={max_age}"
+            if stale_while_revalidate:
+                cache_control += f", stale-while-revalidate={stale_while_revalidate}"
+            headers.setdefault("Cache-Control", cache_control)
+
+        if resource is not None:
+            pass
+        elif content:
             resource = _ContentResource(
                 content,
                 headers=headers,
@@ -238,6 +511,8 @@ class Provider(_BackgroundServer):
                 extension=extension,
                 provider=self,
                 route=route,
+                ttl=ttl,
+                stale_while_revalidate=stale_while_revalidate,
             )
         else:
             raise ValueError("Must provide one of content, filepath, or handler.")
@@ -0,0 +1,504 @@
+"""Quantized TopoJSON encoding of geo interface data.
+
+GeoJSON stores every coordinate of every geometry at full precision, so the
+borders shared by adjacent polygons are stored twice. TopoJSON instead stores
+each shared border once, as an arc referenced by every geometry it bounds, and
+quantizes coordinates to integers which are delta-encoded along each arc.
+
+Arcs are found as in the reference implementation: a junction is any point at
+which lines meet or diverge, and lines are cut into arcs at their junctions.
+Coordinate work is done with numpy over whole lines or the whole topology.
+"""
+
+import asyncio
+import json
+import math
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+import weakref
+
+import numpy as np
+import tornado.ioloop
+import tornado.web
+
+from altair_data_server._cache import MemoryBudget
+from altair_data_server._provide import Provider, Resource
+
+Bbox = Tuple[float, float, float, float]
+
+# Name of the TopoJSON object holding the features.
+OBJECT_NAME = "data"
+
+# Largest quantization for which the int64 junction keys ``x * q + y`` of
+# quantized points cannot overflow.
+_MAX_QUANTIZATION = 2**31
+
+_DEPTHS = {
+    "Point": 0,
+    "MultiPoint": 1,
+    "LineString": 1,
+    "MultiLineString": 2,
+    "Polygon": 2,
+    "MultiPolygon": 3,
+}
+
+
+def _json_default(obj: Any) -> Any:
+    # numpy arrays and scalars, e.g. in geopandas properties.
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _features(geo: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Normalize a geo interface mapping to a list of GeoJSON features."""
+    data = json.loads(json.dumps(geo, default=_json_default))
+    if data["type"] == "FeatureCollection":
+        return data["features"]
+    if data["type"] == "Feature":
+        return [data]
+    return [{"type": "Feature", "properties": {}, "geometry": data}]
+
+
+def _positions(geometry: Optional[Dict[str, Any]]) -> List[Sequence[float]]:
+    """All positions of a geometry."""
+    if geometry is None:
+        return []
+    if geometry["type"] == "GeometryCollection":
+        return [p for g in geometry["geometries"] for p in _positions(g)]
+    positions = [geometry["coordinates"]]
+    for _ in range(_DEPTHS[geometry["type"]]):
+        positions = [p for c in positions for p in c]
+    return positions
+
+
+def _feature_bounds(features: List[Dict[str, Any]]) -> np.ndarray:
+    """Array of [xmin, ymin, xmax, ymax] per feature, NaN if empty."""
+    bounds = np.full((len(features), 4), np.nan)
+    for i, feature in enumerate(features):
+        positions = _positions(feature.get("geometry"))
+        if positions:
+            xy = np.array([p[:2] for p in positions], dtype=float)
+            bounds[i, :2] = xy.min(axis=0)
+            bounds[i, 2:] = xy.max(axis=0)
+    return bounds
+
+
+def _as_array(coordinates: Sequence[Sequence[float]]) -> np.ndarray:
+    array = np.asarray(coordinates, dtype=float)
+    if array.size == 0:
+        return np.empty((0, 2))
+    return array[:, :2]
+
+
+def _extract(
+    geometry: Optional[Dict[str, Any]], lines: List[np.ndarray], rings: List[bool]
+) -> Optional[Dict[str, Any]]:
+    """Replace the lines and rings of a geometry with indices into lines."""
+    if geometry is None:
+        return None
+    kind = geometry["type"]
+    if kind == "GeometryCollection":
+        return {
+            "type": kind,
+            "geometries": [_extract(g, lines, rings) for g in geometry["geometries"]],
+        }
+    coordinates = geometry["coordinates"]
+    if kind in ("Point", "MultiPoint"):
+        return {"type": kind, "coordinates": coordinates}
+
+    def add(line: Sequence[Sequence[float]], ring: bool) -> int:
+        lines.append(_as_array(line))
+        rings.append(ring)
+        return len(lines) - 1
+
+    arcs: Any
+    if kind == "LineString":
+        arcs = add(coordinates, False)
+    elif kind == "MultiLineString":
+        arcs = [add(line, False) for line in coordinates]
+    elif kind == "Polygon":
+        arcs = [add(ring, True) for ring in coordinates]
+    elif kind == "MultiPolygon":
+        arcs = [[add(ring, True) for ring in polygon] for polygon in coordinates]
+    else:
+        raise ValueError(f"Unrecognized geometry type: {kind!r}")
+    return {"type": kind, "arcs": arcs}
+
+
+def _dedupe(line: np.ndarray, ring: bool) -> np.ndarray:
+    """Drop consecutive duplicate points, keeping lines and rings valid."""
+    if len(line):
+        keep = np.r_[True, np.any(np.diff(line, axis=0) != 0, axis=1)]
+        line = line[keep]
+    if ring and len(line) and np.any(line[0] != line[-1]):
+        line = np.vstack([line, line[:1]])
+    if len(line) == 1:
+        line = np.vstack([line, line])
+    return line
+
+
+def _junctions(lines: List[np.ndarray], rings: List[bool], base: int) -> np.ndarray:
+    """Keys of the points at which lines meet or diverge, or which end lines.
+
+    A point is a junction if it is visited with more than one distinct pair of
+    neighbours, regardless of direction.
+    """
+    keys, lows, highs, ends = [], [], [], []
+    for line, ring in zip(lines, rings):
+        if not len(line):
+            continue
+        key = line[:, 0] * base + line[:, 1]
+        if ring:
+            key = key[:-1]
+            previous, following = np.roll(key, 1), np.roll(key, -1)
+        else:
+            previous = np.r_[-1, key[:-1]]
+            following = np.r_[key[1:], -1]
+            ends.extend([key[0], key[-1]])
+        keys.append(key)
+        lows.append(np.minimum(previous, following))
+        highs.append(np.maximum(previous, following))
+    if not keys:
+        return np.empty(0, dtype=np.int64)
+    visits = np.unique(
+        np.stack([np.concatenate(keys), np.concatenate(lows), np.concatenate(highs)]),
+        axis=1,
+    )
+    points, counts = np.unique(visits[0], return_counts=True)
+    return np.union1d(points[counts > 1], np.array(ends, dtype=np.int64))
+
+
+def _cut(line: np.ndarray, ring: bool, junctions: np.ndarray, base: int) -> List:
+    """Cut a line into arcs at its junctions."""
+    if not len(line):
+        return []
+    key = line[:, 0] * base + line[:, 1]
+    if ring:
+        # Rotate the ring to start at a junction, or at its smallest point if
+        # it has none, so that identical rings produce identical arcs.
+        cuts = np.flatnonzero(np.isin(key[:-1], junctions))
+        start = cuts[0] if len(cuts) else np.argmin(key[:-1])
+        points = np.roll(line[:-1], -start, axis=0)
+        line = np.vstack([points, points[:1]])
+        cuts = np.r_[(cuts - start) % len(points), len(points)]
+        cuts = np.unique(np.r_[0, cuts])
+    else:
+        cuts = np.flatnonzero(np.isin(key, junctions))
+    return [line[a : b + 1] for a, b in zip(cuts[:-1], cuts[1:])]
+
+
+def _simplify(arc: np.ndarray, min_area: float, scale: np.ndarray) -> np.ndarray:
+    """Visvalingam-Whyatt simplification of an arc, in vectorized passes.
+
+    Each pass removes every interior point whose triangle with its neighbours
+    has an area below ``min_area`` and smaller than the triangles of both
+    neighbours, so that no two adjacent points are removed in the same pass.
+    Endpoints are always kept.
+    """
+    closed = len(arc) > 2 and np.all(arc[0] == arc[-1])
+    min_points = 4 if closed else 2
+    while len(arc) > min_points:
+        xy = arc * scale
+        a, b, c = xy[:-2], xy[1:-1], xy[2:]
+        area = 0.5 * np.abs(
+            (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+            - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])
+        )
+        padded = np.r_[np.inf, area, np.inf]
+        remove = (area < min_area) & (area <= padded[:-2]) & (area < padded[2:])
+        removable = np.flatnonzero(remove)[: len(arc) - min_points]
+        if not len(removable):
+            break
+        keep = np.ones(len(arc), dtype=bool)
+        keep[removable + 1] = False
+        arc = arc[keep]
+    return arc
+
+
+def _fill(
+    geometry: Optional[Dict[str, Any]], arcs: List[List[int]], quantize: Any
+) -> Any:
+    """Replace the line indices of an extracted geometry with arc indices."""
+    if geometry is None:
+        return {"type": None}
+    kind = geometry["type"]
+    if kind == "GeometryCollection":
+        return {
+            "type": kind,
+            "geometries": [_fill(g, arcs, quantize) for g in geometry["geometries"]],
+        }
+    if kind == "Point":
+        return {"type": kind, "coordinates": quantize([geometry["coordinates"]])[0]}
+    if kind == "MultiPoint":
+        return {"type": kind, "coordinates": quantize(geometry["coordinates"])}
+    depth = _DEPTHS[kind] - 1
+
+    def resolve(value: Any, depth: int) -> Any:
+        if depth == 0:
+            return arcs[value]
+        return [resolve(v, depth - 1) for v in value]
+
+    return {"type": kind, "arcs": resolve(geometry["arcs"], depth)}
+
+
+def to_topojson(
+    geo: Mapping[str, Any],
+    quantization: int = 10000,
+    simplify: Optional[float] = None,
+    bbox: Optional[Bbox] = None,
+) -> Dict[str, Any]:
+    """Convert a geo interface mapping to quantized TopoJSON.
+
+    Parameters
+    ----------
+    geo : dict
+        A ``__geo_interface__`` mapping: a FeatureCollection, Feature or
+        geometry.
+    quantization : int
+        Number of distinct values of each quantized coordinate, between 2 and
+        2**31. Default 10000.
+    simplify : float, optional
+        If given, remove points whose triangle with their neighbours has an
+        area below ``simplify ** 2``, in the units of the input coordinates.
+    bbox : tuple, optional
+        If given as ``(xmin, ymin, xmax, ymax)``, only include the features
+        which intersect this box.
+
+    Returns
+    -------
+    topology : dict
+        TopoJSON topology, with the features in the ``"data"`` object.
+
+    Examples
+    --------
+    Two adjacent squares share the arc along their common edge, which is
+    referenced in reverse (as ``~0 == -1``) by the second square:
+
+    >>> squares = {"type": "MultiPolygon", "coordinates": [
+    ...     [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]],
+    ...     [[[1, 0], [2, 0], [2, 1], [1, 1], [1, 0]]],
+    ... ]}
+    >>> topology = to_topojson(squares, quantization=3)
+    >>> topology["objects"]["data"]["geometries"][0]["arcs"]
+    [[[0, 1]], [[2, -1]]]
+    """
+    return _encode(_features(geo), quantization, simplify, bbox=bbox)
+
+
+def _check_arguments(quantization: int, simplify: Optional[float]) -> None:
+    if not 2 <= quantization <= _MAX_QUANTIZATION:
+        raise ValueError(
+            f"quantization must be between 2 and {_MAX_QUANTIZATION}, "
+            f"got {quantization}"
+        )
+    if simplify is not None and not (math.isfinite(simplify) and simplify >= 0):
+        raise ValueError(
+            f"simplify must be a non-negative finite number, got {simplify}"
+        )
+
+
+def _encode(
+    features: List[Dict[str, Any]],
+    quantization: int,
+    simplify: Optional[float],
+    bounds: Optional[np.ndarray] = None,
+    bbox: Optional[Bbox] = None,
+) -> Dict[str, Any]:
+    _check_arguments(quantization, simplify)
+    if bounds is None:
+        bounds = _feature_bounds(features)
+    if bbox is not None:
+        xmin, ymin, xmax, ymax = bbox
+        selected = np.flatnonzero(
+            (bounds[:, 0] <= xmax)
+            & (bounds[:, 2] >= xmin)
+            & (bounds[:, 1] <= ymax)
+            & (bounds[:, 3] >= ymin)
+        )
+        features = [features[i] for i in selected]
+        bounds = bounds[selected]
+
+    lines: List[np.ndarray] = []
+    rings: List[bool] = []
+    geometries = [_extract(f.get("geometry"), lines, rings) for f in features]
+    bounds = bounds[~np.isnan(bounds).any(axis=1)]
+    if len(bounds):
+        lower, upper = bounds[:, :2].min(axis=0), bounds[:, 2:].max(axis=0)
+    else:
+        lower, upper = np.zeros(2), np.zeros(2)
+    extent = upper - lower
+    scale = np.where(extent > 0, extent / (quantization - 1), 1.0)
+
+    def quantize(coordinates: Sequence[Sequence[float]]) -> List[List[int]]:
+        array = np.round((_as_array(coordinates) - lower) / scale)
+        return array.astype(np.int64).tolist()
+
+    quantized = [
+        _dedupe(np.round((line - lower) / scale).astype(np.int64), ring)
+        for line, ring in zip(lines, rings)
+    ]
+    junctions = _junctions(quantized, rings, quantization)
+
+    arcs: List[np.ndarray] = []
+    index: Dict[bytes, int] = {}
+    line_arcs: List[List[int]] = []
+    for line, ring in zip(quantized, rings):
+        refs = []
+        for arc in _cut(line, ring, junctions, quantization):
+            arc = np.ascontiguousarray(arc)
+            forward = arc.tobytes()
+            if forward in index:
+                refs.append(index[forward])
+                continue
+            backward = np.ascontiguousarray(arc[::-1]).tobytes()
+            if backward in index:
+                refs.append(~index[backward])
+                continue
+            index[forward] = len(arcs)
+            refs.append(len(arcs))
+            arcs.append(arc)
+        line_arcs.append(refs)
+
+    if simplify:
+        arcs = [_simplify(arc, simplify**2, scale) for arc in arcs]
+
+    objects = []
+    for feature, geometry in zip(features, geometries):
+        obj = _fill(geometry, line_arcs, quantize)
+        if feature.get("properties"):
+            obj["properties"] = feature["properties"]
+        if feature.get("id") is not None:
+            obj["id"] = feature["id"]
+        objects.append(obj)
+
+    return {
+        "type": "Topology",
+        "bbox": [*lower.tolist(), *upper.tolist()],
+        "transform": {"scale": scale.tolist(), "translate": lower.tolist()},
+        "objects": {OBJECT_NAME: {"type": "GeometryCollection", "geometries": objects}},
+        "arcs": [np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist() for arc in arcs],
+    }
+
+
+def _variant_evictor(variants: Dict[Any, bytes], key: Any) -> Callable[[], None]:
+    """Eviction callback which drops one encoded variant of a resource."""
+
+    def evict() -> None:
+        variants.pop(key, None)
+
+    return evict
+
+
+def _discard_all(cache: MemoryBudget, keys: Set[Any]) -> None:
+    for key in keys:
+        cache.discard(key)
+
+
+class _TopoJSONResource(Resource):
+    """TopoJSON Resource
+
+    Serves geo interface data as quantized TopoJSON. The ``quantization``,
+    ``simplify`` and ``bbox`` query arguments select the precision and the
+    viewport; each variant is encoded on first request and cached against the
+    provider's memory budget. Concurrent requests for a variant which is not
+    cached share a single encoding.
+    """
+
+    def __init__(
+        self,
+        geo: Mapping[str, Any],
+        provider: Provider,
+        headers: Dict[str, str],
+        extension: Optional[str] = None,
+        route: Optional[str] = None,
+        quantization: int = 10000,
+    ):
+        self.features = _features(geo)
+        self.quantization = quantization
+        self._bounds = _feature_bounds(self.features)
+        self._variants: Dict[Any, bytes] = {}
+        self._pending: Dict[Any, "asyncio.Future[bytes]"] = {}
+        self._cache_keys: Set[Any] = set()
+        weakref.finalize(self, _discard_all, provider._cache, self._cache_keys)
+        super().__init__(
+            provider=provider, headers=headers, extension=extension, route=route
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(content) for content in list(self._variants.values()))
+
+    def _arguments(
+        self, handler: tornado.web.RequestHandler
+    ) -> Tuple[int, Optional[float], Optional[Bbox]]:
+        """Parse the variant from the query arguments of a request."""
+        try:
+            quantization = int(handler.get_argument("quantization", "0"))
+            quantization = quantization or self.quantization
+            value = handler.get_argument("simplify", "")
+            simplify = float(value) if value else None
+            _check_arguments(quantization, simplify)
+            bbox = handler.get_argument("bbox", "")
+            box = [float(x) for x in bbox.split(",")] if bbox else None
+            if box is not None and len(box) != 4:
+                raise ValueError("bbox must have four values")
+        except ValueError as err:
+            raise tornado.web.HTTPError(400, str(err))
+        return (
+            quantization,
+            simplify,
+            (box[0], box[1], box[2], box[3]) if box else None,
+        )
+
+    def get(self, handler: tornado.web.RequestHandler) -> Optional[Awaitable[None]]:
+        super().get(handler)
+        variant = self._arguments(handler)
+        key = (id(self), variant)
+        if variant in self._variants:
+            self._provider._cache.touch(key)
+            handler.write(self._variants[variant])
+            return None
+        return self._write_variant(handler, variant)
+
+    async def _write_variant(
+        self, handler: tornado.web.RequestHandler, variant: Tuple
+    ) -> None:
+        handler.write(await self._encode_variant(variant))
+
+    def _encode_variant(self, variant: Tuple) -> "asyncio.Future[bytes]":
+        """Encode a variant, sharing any encoding already in flight."""
+        if variant not in self._pending:
+            self._pending[variant] = asyncio.ensure_future(self._compute(variant))
+        return self._pending[variant]
+
+    async def _compute(self, variant: Tuple) -> bytes:
+        def encode() -> bytes:
+            quantization, simplify, bbox = variant
+            topology = _encode(
+                self.features, quantization, simplify, self._bounds, bbox
+            )
+            return json.dumps(topology, separators=(",", ":")).encode()
+
+        loop = tornado.ioloop.IOLoop.current()
+        try:
+            content = await loop.run_in_executor(None, encode)
+        finally:
+            del self._pending[variant]
+        key = (id(self), variant)
+        self._variants[variant] = content
+        self._cache_keys.add(key)
+        self._provider._cache.add(
+            key, len(content), _variant_evictor(self._variants, variant)
+        )
+        return content
@@ -1,3 +1,4 @@
+import json
 import portpicker
 import re
 from typing import Any, Callable
@@ -5,7 +6,10 @@ from typing import Any, Callable
 import numpy as np
 import pandas as pd
 import pytest
-from altair_data_server import data_server, data_server_proxied
+from tornado.httpclient import HTTPClient
+from altair_data_server import columnar_transforms, data_server, data_server_proxied
+from altair_data_server._columnar import to_columnar_json
+from altair_data_server import _altair_server
 
 
 @pytest.fixture(scope="session")
@@ -73,3 +77,186 @@ def test_data_server_port(
     spec = server_function(data, port=port, fmt=fmt)
     url = url_decoder(spec["url"], fmt=fmt)
     assert str(port) in url
+
+
+def test_data_server_port_change(data: pd.DataFrame, session_context: Any) -> None:
+    port1, port2 = portpicker.pick_unused_port(), portpicker.pick_unused_port()
+    url1 = data_server(data, port=port1)["url"]
+    provider = data_server._get_provider()
+    thread = provider._server_thread
+    url2 = data_server(data, port=port2)["url"]
+    assert str(port1) in url1 and str(port2) in url2
+
+    # Both ports are served by the same server thread.
+    assert provider._server_thread is thread
+    assert {port1, port2} <= set(provider.ports)
+    assert pd.read_json(url1).equals(pd.read_json(url2))
+
+
+def test_data_server_admin(data: pd.DataFrame) -> None:
+    server = _altair_server.AltairDataServer(admin=True, cache_size=1000)
+    try:
+        url = server(data)["url"]
+        HTTPClient().fetch(url)
+        provider = server._get_provider()
+        assert provider._cache.max_bytes == 1000
+        admin_url = f"{provider.url}/_admin/resources"
+        admin = json.loads(HTTPClient().fetch(admin_url).body)
+        [stats] = admin["resources"]
+        assert url.endswith(stats["route"])
+        assert stats["hits"] == 1
+        assert admin["cache"]["max_bytes"] == 1000
+    finally:
+        server.reset()
+    assert server._provider is None
+
+
+def _expand_columnar(payload: dict, transforms: list) -> dict:
+    # Python equivalent of the flatten & calculate transforms. Flatten reads
+    # escaped field strings and writes to the names given in "as".
+    flatten = transforms[0]
+    result = {
+        name: payload[re.sub(r"\\(.)", r"\1", field)]
+        for field, name in zip(flatten["flatten"], flatten["as"])
+    }
+    for transform in transforms[1:]:
+        name = transform["as"]
+        categories = payload["__categories__" + name]
+        result[name] = [None if code < 0 else categories[code] for code in result[name]]
+    return result
+
+
+def test_data_server_columnar(session_context: Any) -> None:
+    data = pd.DataFrame(
+        {
+            "x": np.arange(6),
+            "y": list("ABABAB"),
+            "z": pd.Categorical(["u", "v", None, "u", "v", "u"]),
+            "w": list("abcdef"),
+        }
+    )
+    spec = data_server(data, fmt="columnar")
+    assert spec["url"].endswith(".json")
+
+    payload = json.loads(HTTPClient().fetch(spec["url"]).body)
+    assert payload["y"] == [0, 1, 0, 1, 0, 1]
+    assert payload["__categories__y"] == ["A", "B"]
+    assert payload["z"] == [0, 1, -1, 0, 1, 0]
+    assert "__categories__w" not in payload
+
+    transforms = columnar_transforms(data)
+    assert [t["as"] for t in transforms[1:]] == ["y", "z"]
+    expanded = _expand_columnar(payload, transforms)
+    assert expanded["x"] == data["x"].tolist()
+    assert expanded["y"] == data["y"].tolist()
+    assert expanded["z"] == ["u", "v", None, "u", "v", "u"]
+    assert expanded["w"] == data["w"].tolist()
+
+
+def test_columnar_object_columns() -> None:
+    data = pd.DataFrame(
+        {
+            "a": [[1, 2], [1, 2], [3], [3]],
+            "b": [True, False, True, True],
+            "c": pd.Series(["u", "u", "v", "u"], dtype=object),
+        }
+    )
+    payload = json.loads(to_columnar_json(data))
+    assert payload["a"] == [[1, 2], [1, 2], [3], [3]]
+    assert payload["b"] == [True, False, True, True]
+    assert payload["c"] == [0, 0, 1, 0]
+    transforms = columnar_transforms(data)
+    assert [t["as"] for t in transforms[1:]] == ["c"]
+
+
+def test_columnar_escaped_column_names() -> None:
+    data = pd.DataFrame({"a.b": list("uvuu"), "c[0]": [1, 2, 3, 4]})
+    transforms = columnar_transforms(data)
+    assert transforms[0] == {
+        "flatten": ["a\\.b", "c\\[0\\]"],
+        "as": ["a.b", "c[0]"],
+    }
+    expanded = _expand_columnar(json.loads(to_columnar_json(data)), transforms)
+    assert expanded == {"a.b": list("uvuu"), "c[0]": [1, 2, 3, 4]}
+
+
+def test_columnar_invalid_column_name() -> None:
+    with pytest.raises(ValueError, match="Column names must be strings"):
+        columnar_transforms(pd.DataFrame({1: ["a", "a", "a"]}))
+
+
+class GeoData:
+    __geo_interface__ = {
+        "type": "Feature",
+        "properties": {"name": "square"},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]],
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "server_function,url_decoder",
+    [(data_server, _decode_normal_url), (data_server_proxied, _decode_proxied_url)],
+)
+def test_data_server_topojson(
+    session_context: Any, server_function: Callable, url_decoder: Callable
+) -> None:
+    spec = server_function(GeoData(), fmt="topojson", quantization=100)
+    assert spec["format"] == {"type": "topojson", "feature": "data"}
+    assert spec["url"].endswith("?quantization=100")
+
+    url, query = spec["url"].split("?")
+    url = url_decoder(url, fmt="topojson")
+    topology = json.loads(HTTPClient().fetch(f"{url}?{query}").body)
+    assert topology["type"] == "Topology"
+    assert topology["transform"]["scale"] == [1 / 99, 1 / 99]
+    geometry = topology["objects"]["data"]["geometries"][0]
+    assert geometry["properties"] == {"name": "square"}
+
+
+def test_data_server_topojson_requires_geo(
+    data: pd.DataFrame, session_context: Any
+) -> None:
+    with pytest.raises(ValueError):
+        data_server(data, fmt="topojson")
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"quantization": 1}, {"quantization": 2**32}, {"simplify": -1.0}]
+)
+def test_data_server_topojson_invalid_arguments(
+    session_context: Any, kwargs: Any
+) -> None:
+    with pytest.raises(ValueError):
+        data_server(GeoData(), fmt="topojson", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "fmt,parse_function", [("json", pd.read_json), ("csv", pd.read_csv)]
+)
+def test_data_server_arrow_storage(
+    data: pd.DataFrame, session_context: Any, fmt: str, parse_function: Callable
+) -> None:
+    pytest.importorskip("pyarrow")
+    spec = data_server(data, fmt=fmt, storage="arrow")
+    assert spec["url"].endswith(f".{fmt}")
+    assert data.equals(parse_function(spec["url"]))
+    assert data_server(data.copy(), fmt=fmt, storage="arrow") == spec
+
+
+@pytest.mark.parametrize(
+    "fmt,parse_function", [("json", pd.read_json), ("csv", pd.read_csv)]
+)
+def test_data_server_processes(
+    data: pd.DataFrame,
+    session_context: Any,
+    monkeypatch: Any,
+    fmt: str,
+    parse_function: Callable,
+) -> None:
+    monkeypatch.setattr(_altair_server, "_PARALLEL_MIN_ROWS", 0)
+    spec = data_server(data, fmt=fmt, processes=2)
+    assert spec == data_server(data, fmt=fmt)
+    assert data.equals(parse_function(spec["url"]))
@@ -0,0 +1,97 @@
+import gc
+import os
+from typing import Iterator
+
+from altair.utils.data import _data_to_csv_string, _data_to_json_string
+import numpy as np
+import pandas as pd
+import pytest
+from tornado.httpclient import HTTPClient
+
+from altair_data_server import Provider
+from altair_data_server._arrow import ArrowStore, _ArrowResource, data_hash
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture(scope="module")
+def provider() -> Iterator[Provider]:
+    provider = Provider()
+    yield provider
+    provider.stop()
+
+
+@pytest.fixture
+def store() -> Iterator[ArrowStore]:
+    store = ArrowStore(chunksize=3)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def data() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "x": np.arange(10),
+            "y": list("ABCDEFGHIJ"),
+            "z": pd.Categorical(list("uvuvuvuvuv")),
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "fmt,serialize", [("json", _data_to_json_string), ("csv", _data_to_csv_string)]
+)
+@pytest.mark.parametrize("rows", [0, 1, 10])
+def test_arrow_resource(
+    provider: Provider,
+    store: ArrowStore,
+    data: pd.DataFrame,
+    fmt: str,
+    serialize: object,
+    rows: int,
+) -> None:
+    data = data.iloc[:rows]
+    resource = provider.create(
+        resource=_ArrowResource(store.write(data), fmt, provider=provider, headers={})
+    )
+    body = HTTPClient().fetch(resource.url).body.decode()
+    assert body == serialize(data)  # type: ignore
+
+
+def test_arrow_resource_cleanup(
+    provider: Provider, store: ArrowStore, data: pd.DataFrame
+) -> None:
+    filepath = store.write(data)
+    resource = _ArrowResource(filepath, "json", provider=provider, headers={})
+    assert resource.nbytes == os.path.getsize(filepath)
+    del resource
+    gc.collect()
+    assert not os.path.exists(filepath)
+    store.close()
+    assert not os.path.exists(store.path)
+
+
+def test_data_hash(data: pd.DataFrame) -> None:
+    assert data_hash(data) == data_hash(data.copy())
+    assert data_hash(data) != data_hash(data.iloc[::-1])
+    assert data_hash(data) != data_hash(data.rename(columns={"x": "w"}))
+
+
+def test_arrow_list_column(provider: Provider, store: ArrowStore) -> None:
+    data = pd.DataFrame({"a": [[1, 2], [3], [1, 2]], "b": [1, 2, 3]})
+    assert data_hash(data) == data_hash(data.copy())
+    assert data_hash(data) != data_hash(data.assign(a=[[1, 2], [3], [4]]))
+    resource = provider.create(
+        resource=_ArrowResource(
+            store.write(data), "json", provider=provider, headers={}
+        )
+    )
+    body = HTTPClient().fetch(resource.url).body.decode()
+    assert body == _data_to_json_string(data)
+
+
+def test_arrow_mixed_column(store: ArrowStore) -> None:
+    data = pd.DataFrame({"x": [1, 2], "mixed": [1, "a"]})
+    with pytest.raises(ValueError, match="column 'mixed'"):
+        store.write(data)
@@ -0,0 +1,28 @@
+from typing import Callable, List
+
+from altair_data_server._cache import MemoryBudget
+
+
+def _evictor(evicted: List[str], key: str) -> Callable[[], None]:
+    return lambda: evicted.append(key)
+
+
+def test_memory_budget_lru() -> None:
+    cache = MemoryBudget(20)
+    evicted: List[str] = []
+    cache.add("a", 10, _evictor(evicted, "a"))
+    cache.add("b", 8, _evictor(evicted, "b"))
+    cache.touch("a")
+    cache.add("c", 5, _evictor(evicted, "c"))
+    assert evicted == ["b"]
+    assert cache.nbytes == 15
+
+
+def test_memory_budget_oversized_entry() -> None:
+    cache = MemoryBudget(20)
+    evicted: List[str] = []
+    cache.add("a", 10, _evictor(evicted, "a"))
+    cache.add("b", 8, _evictor(evicted, "b"))
+    cache.add("c", 25, _evictor(evicted, "c"))
+    assert evicted == ["c"]
+    assert cache.nbytes == 18
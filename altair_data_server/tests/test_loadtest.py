@@ -0,0 +1,53 @@
+from altair_data_server import LoadTestReport, Provider, TrafficProfile, run_load_test
+
+
+def test_traffic_profile_reproducible() -> None:
+    profile = TrafficProfile(clients=3, requests_per_client=20, seed=42)
+    assert profile.schedule() == TrafficProfile(**vars(profile)).schedule()
+    assert profile.resource_sizes() == TrafficProfile(seed=42).resource_sizes()
+    assert profile.schedule() != TrafficProfile(seed=43).schedule()
+
+
+def test_traffic_profile_hot_requests() -> None:
+    profile = TrafficProfile(
+        clients=4, requests_per_client=250, resources=10, hot_resources=0.2
+    )
+    requests = [i for schedule in profile.schedule() for i in schedule]
+    assert all(0 <= i < 10 for i in requests)
+    hot_share = sum(i < 2 for i in requests) / len(requests)
+    assert 0.75 < hot_share < 0.85
+
+
+def test_run_load_test() -> None:
+    profile = TrafficProfile(
+        clients=4,
+        requests_per_client=10,
+        resources=5,
+        sizes=(100, 1000),
+        cached_fraction=1.0,
+        ttl=60,
+    )
+    report = run_load_test(profile)
+    assert isinstance(report, LoadTestReport)
+    assert report.requests == 40
+    assert report.errors == 0
+    assert report.throughput > 0
+    assert 0 < report.percentile(50) <= report.percentile(99)
+    assert sum(s["hits"] for s in report.stats) == 40
+    # Each of the 5 handlers is computed once for its 40 requests.
+    assert report.cache_hit_ratio is not None
+    assert report.cache_hit_ratio >= 1 - 5 / 40
+    assert "requests:   40 (0 errors)" in str(report)
+    assert "cache hits:" in str(report)
+
+
+def test_run_load_test_provider() -> None:
+    provider = Provider()
+    try:
+        report = run_load_test(
+            TrafficProfile(clients=2, requests_per_client=5), provider
+        )
+        assert report.requests == 10
+        assert provider.port
+    finally:
+        provider.stop()
@@ -0,0 +1,36 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+
+from altair.utils.data import _data_to_csv_string, _data_to_json_string
+import numpy as np
+import pandas as pd
+import pytest
+
+from altair_data_server._parallel import process_pool, serialize_parallel
+
+
+@pytest.fixture(scope="module")
+def executor() -> Iterator[ProcessPoolExecutor]:
+    with process_pool(2) as executor:
+        yield executor
+
+
+@pytest.mark.parametrize(
+    "fmt,serialize", [("json", _data_to_json_string), ("csv", _data_to_csv_string)]
+)
+@pytest.mark.parametrize("rows,partitions", [(0, 2), (1, 2), (10, 3), (10, 20)])
+def test_serialize_parallel(
+    executor: ProcessPoolExecutor,
+    fmt: str,
+    serialize: Callable,
+    rows: int,
+    partitions: int,
+) -> None:
+    data = pd.DataFrame(
+        {
+            "x": np.arange(rows),
+            "y": [f"value, {i}" for i in range(rows)],
+            "t": pd.date_range("2020-01-01", periods=rows),
+        }
+    )
+    assert serialize_parallel(data, fmt, executor, partitions) == serialize(data)
@@ -1,8 +1,17 @@
+import asyncio
+import gc
+import json
+import logging
+import os
+import portpicker
+import socket
 import tempfile
-from typing import Iterator
+import threading
+import time
+from typing import Iterator, List
 
 import pytest
-from tornado.httpclient import HTTPClient, HTTPClientError
+from tornado.httpclient import AsyncHTTPClient, HTTPClient, HTTPClientError
 import tornado.web
 
 from altair_data_server import Provider, Resource
@@ -111,3 +120,216 @@ def test_expected_404(provider: Provider, http_client: HTTPClient) -> None:
     with pytest.raises(HTTPClientError) as err:
         http_client.fetch(url)
     assert err.value.code == 404
+
+
+def test_resource_registry_concurrent() -> None:
+    provider = Provider()
+    resources: List[Resource] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(4)
+    server_threads = set()
+
+    def create(i: int) -> None:
+        barrier.wait()
+        for j in range(50):
+            resource = provider.create(content=f"concurrent {i} {j}")
+            with lock:
+                resources.append(resource)
+                server_threads.add(provider._server_thread)
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(4)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(provider._resources[r.guid] is r for r in resources)
+        assert server_threads == {provider._server_thread}
+    finally:
+        provider.stop()
+
+
+def test_provider_unlisten(http_client: HTTPClient) -> None:
+    provider = Provider().start()
+    try:
+        port1 = provider.port
+        port2 = portpicker.pick_unused_port()
+        resource = provider.create(content="served on two ports")
+        provider.listen(port2)
+        url1 = resource.url.replace(str(port2), str(port1))
+        assert http_client.fetch(url1).body == b"served on two ports"
+
+        with pytest.raises(ValueError, match="primary port"):
+            provider.unlisten(port2)
+        provider.listen(port1).unlisten(port2)
+        assert provider.ports == [port1]
+        assert http_client.fetch(resource.url).body == b"served on two ports"
+        with pytest.raises(OSError):
+            socket.create_connection(("localhost", port2), timeout=1).close()
+        with pytest.raises(ValueError, match="not listening"):
+            provider.unlisten(port2)
+
+        # The port can be listened on again.
+        provider.listen(port2)
+        assert http_client.fetch(resource.url).body == b"served on two ports"
+    finally:
+        provider.stop()
+
+
+def test_resource_registry_eviction(
+    provider: Provider, http_client: HTTPClient
+) -> None:
+    resource = provider.create(content="short-lived resource")
+    url, guid = resource.url, resource.guid
+    assert http_client.fetch(url).body == b"short-lived resource"
+    del resource
+    gc.collect()
+    assert guid not in provider._resources
+    with pytest.raises(HTTPClientError) as err:
+        http_client.fetch(url)
+    assert err.value.code == 404
+
+
+class SlowHandler:
+    def __init__(self, delay: float = 0) -> None:
+        self.delay = delay
+        self.count = 0
+
+    def __call__(self) -> str:
+        self.count += 1
+        time.sleep(self.delay)
+        return f"slow handler {self.count}"
+
+
+def test_handler_resource_ttl(provider: Provider, http_client: HTTPClient) -> None:
+    handler = SlowHandler()
+    resource = provider.create(handler=handler, ttl=0.2, max_age=10)
+    response = http_client.fetch(resource.url)
+    assert response.body == b"slow handler 1"
+    assert response.headers["Cache-Control"] == "max-age=10"
+    assert http_client.fetch(resource.url).body == b"slow handler 1"
+    time.sleep(0.3)
+    assert http_client.fetch(resource.url).body == b"slow handler 2"
+    assert handler.count == 2
+
+
+def test_handler_resource_stale_while_revalidate(
+    provider: Provider, http_client: HTTPClient
+) -> None:
+    handler = SlowHandler()
+    resource = provider.create(handler=handler, ttl=0.1, stale_while_revalidate=10)
+    assert http_client.fetch(resource.url).body == b"slow handler 1"
+    time.sleep(0.2)
+    # The stale content is served while it is recomputed in the background.
+    assert http_client.fetch(resource.url).body == b"slow handler 1"
+    time.sleep(0.1)
+    assert http_client.fetch(resource.url).body == b"slow handler 2"
+
+
+def test_handler_resource_refresh_error(
+    provider: Provider, http_client: HTTPClient, caplog: pytest.LogCaptureFixture
+) -> None:
+    handler = SlowHandler()
+    resource = provider.create(handler=handler, ttl=0.1, stale_while_revalidate=10)
+    assert http_client.fetch(resource.url).body == b"slow handler 1"
+
+    def fail() -> str:
+        raise RuntimeError("refresh failed")
+
+    resource.func = fail  # type: ignore[attr-defined]
+    time.sleep(0.2)
+    with caplog.at_level(logging.ERROR, logger="tornado.application"):
+        assert http_client.fetch(resource.url).body == b"slow handler 1"
+        time.sleep(0.1)
+    [record] = [r for r in caplog.records if "Error refreshing" in r.getMessage()]
+    assert resource.guid in record.getMessage()
+    assert record.exc_info is not None
+    assert str(record.exc_info[1]) == "refresh failed"
+
+
+def test_handler_resource_single_flight(provider: Provider) -> None:
+    handler = SlowHandler(delay=0.2)
+    resource = provider.create(handler=handler, ttl=10)
+
+    async def fetch_all() -> List[bytes]:
+        client = AsyncHTTPClient()
+        responses = await asyncio.gather(
+            *(client.fetch(resource.url) for _ in range(5))
+        )
+        return [response.body for response in responses]
+
+    assert asyncio.run(fetch_all()) == [b"slow handler 1"] * 5
+    assert handler.count == 1
+
+
+def test_handler_resource_cache_size(http_client: HTTPClient) -> None:
+    provider = Provider(cache_size=20)
+    try:
+        handlers = [SlowHandler(), SlowHandler()]
+        resources = [provider.create(handler=h, ttl=10) for h in handlers]
+        for resource in resources:
+            http_client.fetch(resource.url)
+        # The first output was evicted to make room for the second.
+        assert provider._cache.nbytes == len("slow handler 1")
+        http_client.fetch(resources[1].url)
+        assert [h.count for h in handlers] == [1, 1]
+        http_client.fetch(resources[0].url)
+        assert [h.count for h in handlers] == [2, 1]
+    finally:
+        provider.stop()
+
+
+def test_handler_resource_cache_size_bytes(http_client: HTTPClient) -> None:
+    provider = Provider(cache_size=1000)
+    try:
+        resource = provider.create(handler=lambda: "\u00e9" * 10, ttl=10)
+        assert http_client.fetch(resource.url).body == "\u00e9".encode() * 10
+        assert provider._cache.nbytes == resource.nbytes == 20
+    finally:
+        provider.stop()
+
+
+def test_ttl_requires_handler(provider: Provider) -> None:
+    with pytest.raises(ValueError):
+        provider.create(content="cached content", ttl=10)
+
+
+def test_admin_resources(http_client: HTTPClient) -> None:
+    provider = Provider(admin=True, cache_size=1000)
+    try:
+        resource = provider.create(content="admin content", extension="txt")
+        for _ in range(3):
+            http_client.fetch(resource.url)
+        admin = json.loads(http_client.fetch(f"{provider.url}/_admin/resources").body)
+        assert admin["cache"] == {"nbytes": 0, "max_bytes": 1000}
+        [stats] = admin["resources"]
+        assert stats["route"] == resource.guid
+        assert stats["type"] == "ContentResource"
+        assert stats["format"] == "txt"
+        assert stats["size"] == len("admin content")
+        assert stats["hits"] == 3
+        assert stats["age"] >= 0
+        assert stats["last_access"] >= resource.created
+    finally:
+        provider.stop()
+
+
+def test_admin_removed_file(http_client: HTTPClient) -> None:
+    provider = Provider(admin=True)
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+            f.write(b"removed file")
+        resource = provider.create(filepath=f.name)
+        os.remove(f.name)
+        admin = json.loads(http_client.fetch(f"{provider.url}/_admin/resources").body)
+        [stats] = admin["resources"]
+        assert stats["route"] == resource.guid
+        assert stats["size"] is None
+    finally:
+        provider.stop()
+
+
+def test_admin_disabled(provider: Provider, http_client: HTTPClient) -> None:
+    with pytest.raises(HTTPClientError) as err:
+        http_client.fetch(f"{provider.url}/_admin/resources")
+    assert err.value.code == 404
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import pytest
+from tornado.httpclient import AsyncHTTPClient, HTTPClient, HTTPClientError
+
+from altair_data_server import Provider
+from altair_data_server import _topojson
+from altair_data_server._topojson import _encode, _TopoJSONResource, to_topojson
+
+
+def _square(x: float, y: float, size: float = 1) -> List[List[float]]:
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+@pytest.fixture
+def grid() -> Dict[str, Any]:
+    """A 3x3 grid of adjacent unit squares."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": f"{i}-{j}",
+                "properties": {"i": i, "j": j},
+                "geometry": {"type": "Polygon", "coordinates": [_square(i, j)]},
+            }
+            for i in range(3)
+            for j in range(3)
+        ],
+    }
+
+
+def _decode_arc(topology: Dict[str, Any], index: int) -> np.ndarray:
+    arc = np.cumsum(topology["arcs"][~index if index < 0 else index], axis=0)
+    arc = arc * topology["transform"]["scale"] + topology["transform"]["translate"]
+    return arc[::-1] if index < 0 else arc
+
+
+def _decode_ring(topology: Dict[str, Any], refs: List[int]) -> np.ndarray:
+    arcs = [_decode_arc(topology, ref) for ref in refs]
+    return np.vstack([arcs[0]] + [arc[1:] for arc in arcs[1:]])
+
+
+def test_topojson_roundtrip(grid: Dict[str, Any]) -> None:
+    topology = to_topojson(grid)
+    assert topology["type"] == "Topology"
+    geometries = topology["objects"]["data"]["geometries"]
+    assert len(geometries) == 9
+    for feature, geometry in zip(grid["features"], geometries):
+        assert geometry["type"] == "Polygon"
+        assert geometry["properties"] == feature["properties"]
+        assert geometry["id"] == feature["id"]
+        ring = _decode_ring(topology, geometry["arcs"][0])
+        assert np.allclose(ring[0], ring[-1])
+        expected = {tuple(p) for p in feature["geometry"]["coordinates"][0]}
+        assert {tuple(p) for p in np.round(ring, 6).tolist()} == expected
+
+
+def test_topojson_shared_arcs(grid: Dict[str, Any]) -> None:
+    topology = to_topojson(grid)
+    refs = [
+        ref
+        for geometry in topology["objects"]["data"]["geometries"]
+        for ref in geometry["arcs"][0]
+    ]
+    # Each arc is used at most twice, once in each direction.
+    used = [r if r >= 0 else ~r for r in refs]
+    assert len(set(used)) == len(topology["arcs"]) < len(refs)
+    assert all(used.count(i) <= 2 for i in set(used))
+    # 12 unit edges on the outside, and 12 shared inside.
+    total = sum(len(arc) - 1 for arc in topology["arcs"])
+    assert total == 24
+
+
+def test_topojson_quantization() -> None:
+    line = {"type": "LineString", "coordinates": [[0, 0], [0.3, 0.1], [1, 1]]}
+    topology = to_topojson(line, quantization=11)
+    assert topology["transform"] == {"scale": [0.1, 0.1], "translate": [0, 0]}
+    assert topology["arcs"] == [[[0, 0], [3, 1], [7, 9]]]
+
+
+def test_topojson_points() -> None:
+    points = {"type": "MultiPoint", "coordinates": [[0, 0], [2, 4], [1, 1]]}
+    topology = to_topojson(points, quantization=5)
+    geometry = topology["objects"]["data"]["geometries"][0]
+    assert geometry["coordinates"] == [[0, 0], [4, 4], [2, 1]]
+    assert topology["arcs"] == []
+
+
+def test_topojson_simplify() -> None:
+    x = np.linspace(0, 10, 101)
+    wiggle = np.c_[x, 0.001 * np.sin(10 * x)].tolist()
+    line = {"type": "LineString", "coordinates": wiggle}
+    assert len(to_topojson(line)["arcs"][0]) == 101
+    topology = to_topojson(line, simplify=0.1)
+    assert len(topology["arcs"][0]) == 2
+    assert np.allclose(_decode_arc(topology, 0), [wiggle[0], wiggle[-1]], atol=1e-6)
+
+
+def test_topojson_bbox(grid: Dict[str, Any]) -> None:
+    topology = to_topojson(grid, bbox=(0.2, 0.2, 0.8, 1.5))
+    geometries = topology["objects"]["data"]["geometries"]
+    assert [g["id"] for g in geometries] == ["0-0", "0-1"]
+    assert topology["bbox"] == [0, 0, 1, 2]
+
+
+@pytest.fixture(scope="module")
+def provider() -> Iterator[Provider]:
+    provider = Provider()
+    yield provider
+    provider.stop()
+
+
+def test_topojson_resource(provider: Provider, grid: Dict[str, Any]) -> None:
+    http_client = HTTPClient()
+    resource = provider.create(
+        resource=_TopoJSONResource(grid, provider=provider, headers={})
+    )
+    full = json.loads(http_client.fetch(resource.url).body)
+    assert full == to_topojson(grid)
+
+    tile = json.loads(http_client.fetch(resource.url + "?bbox=0,0,0.5,0.5").body)
+    assert len(tile["objects"]["data"]["geometries"]) == 1
+    coarse = json.loads(http_client.fetch(resource.url + "?quantization=10").body)
+    assert coarse == to_topojson(grid, quantization=10)
+    assert provider._cache.nbytes > 0
+
+
+def test_topojson_resource_single_flight(
+    provider: Provider, grid: Dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    expected = to_topojson(grid, quantization=100)
+    calls = []
+
+    def slow_encode(*args: Any) -> Dict[str, Any]:
+        calls.append(args)
+        time.sleep(0.2)
+        return _encode(*args)
+
+    monkeypatch.setattr(_topojson, "_encode", slow_encode)
+    resource = provider.create(
+        resource=_TopoJSONResource(grid, provider=provider, headers={})
+    )
+
+    async def fetch_all() -> List[bytes]:
+        client = AsyncHTTPClient()
+        responses = await asyncio.gather(
+            *(client.fetch(resource.url + "?quantization=100") for _ in range(5))
+        )
+        return [response.body for response in responses]
+
+    bodies = asyncio.run(fetch_all())
+    assert len(calls) == 1
+    assert [json.loads(body) for body in bodies] == [expected] * 5
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "bbox=0,0,1",
+        "simplify=abc",
+        "simplify=-1",
+        "simplify=nan",
+        "simplify=inf",
+        "quantization=1",
+        f"quantization={2**31 + 1}",
+    ],
+)
+def test_topojson_resource_bad_request(
+    provider: Provider, grid: Dict[str, Any], query: str
+) -> None:
+    resource = provider.create(
+        resource=_TopoJSONResource(grid, provider=provider, headers={})
+    )
+    with pytest.raises(HTTPClientError) as err:
+        HTTPClient().fetch(resource.url + "?" + query)
+    assert err.value.code == 400
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"quantization": 1}, {"quantization": 2**32}, {"simplify": -1.0}]
+)
+def test_topojson_invalid_arguments(grid: Dict[str, Any], kwargs: Any) -> None:
+    with pytest.raises(ValueError):
+        to_topojson(grid, **kwargs)